@@ -1,21 +1,47 @@
 import os
-from typing import Optional
+from dataclasses import dataclass
+from typing import Optional, Tuple
 
-# Port for local development
-PORT = int(os.getenv("PORT", "8000"))
 
-# CORS origins - allow all for development, restrict in production
-CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """Environment configuration, read once at import time."""
 
-# Environment check
-ENV = os.getenv("ENV", "development")
+    # Port for local development
+    port: int
+    # CORS origins - allow all for development, restrict in production
+    cors_origins: Tuple[str, ...]
+    # How long (seconds) browsers may cache CORS preflight responses
+    cors_max_age: int
+    # Environment check
+    env: str
+    # Gemini configuration
+    gemini_api_key: str
+    gemini_model_name: str
+    # Maximum concurrent Gemini requests per worker
+    gemini_max_concurrency: int
+    # Number of transcription results kept in the in-process cache (0 disables)
+    transcription_cache_size: int
 
-# Gemini configuration
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-2.0-flash-exp")
 
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY environment variable is required")
+def _load_settings() -> Settings:
+    gemini_api_key = os.getenv("GEMINI_API_KEY")
+    if not gemini_api_key:
+        raise ValueError("GEMINI_API_KEY environment variable is required")
+
+    return Settings(
+        port=int(os.getenv("PORT", "8000")),
+        cors_origins=tuple(os.getenv("CORS_ORIGINS", "*").split(",")),
+        cors_max_age=int(os.getenv("CORS_MAX_AGE", "86400")),
+        env=os.getenv("ENV", "development"),
+        gemini_api_key=gemini_api_key,
+        gemini_model_name=os.getenv("GEMINI_MODEL_NAME", "gemini-2.0-flash-exp"),
+        gemini_max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "4")),
+        transcription_cache_size=int(os.getenv("TRANSCRIPTION_CACHE_SIZE", "64")),
+    )
+
+
+settings = _load_settings()
 
 
 def get_env_var(key: str, required: bool = True) -> Optional[str]:
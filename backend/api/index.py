@@ -1,57 +1,76 @@
 import logging
 import re
-from typing import Any, Dict, List
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Literal
 
 from fastapi import FastAPI, File, HTTPException, UploadFile
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from fastapi.middleware.cors import CORSMiddleware
-
-from api.config import CORS_ORIGINS, ENV
-from api.services.transcription import transcribe_audio
+from fastapi.responses import ORJSONResponse
+
+from api.config import settings
+from api.logging_config import configure_logging
+from api.services.archive import get_archive_manager
+from api.services.transcription import (
+    MAX_AUDIO_BYTES,
+    UnsupportedAudioError,
+    generate_content,
+    transcribe_audio,
+)
 
 # Setup logging for Vercel
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Close pooled archive connections when the server stops."""
+    yield
+    await get_archive_manager().aclose()
+
+
 # Initialize FastAPI
 app = FastAPI(
     title="Triumphant Transcripts API",
     description="Audio transcription API with Gemini",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
-# CORS - Critical for Expo Go to connect
+# CORS - Critical for Expo Go to connect. Browsers ignore Max-Age for
+# wildcard origins with credentials, so only allow credentials when the
+# origin list is explicit.
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=CORS_ORIGINS,
-    allow_credentials=True,
+    allow_origins=settings.cors_origins,
+    allow_credentials=settings.cors_origins != ("*",),
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=settings.cors_max_age,
 )
 
 @app.get("/")
 def read_root() -> Dict[str, str]:
     """Root endpoint - confirms API is running"""
-    logger.info("root_endpoint_accessed")
+    logger.debug("root_endpoint_accessed")
     return {
         "message": "Triumphant Transcripts API is live!",
-        "environment": ENV,
+        "environment": settings.env,
         "version": "1.0.0"
     }
 
 @app.get("/api/health")
 def health_check() -> Dict[str, str]:
     """Health check endpoint for monitoring"""
-    logger.info("health_check_accessed")
+    logger.debug("health_check_accessed")
     return {"status": "ok"}
 
 @app.get("/api/test")
 def test_endpoint() -> Dict[str, str]:
     """Test endpoint to verify API is reachable from mobile"""
-    logger.info("test_endpoint_accessed")
+    logger.debug("test_endpoint_accessed")
     return {
         "message": "If you can see this from your phone, CORS is working!",
         "timestamp": "2025-01-01T00:00:00Z"
@@ -60,9 +79,15 @@ def test_endpoint() -> Dict[str, str]:
 
 class TransformRequest(BaseModel):
     text: str
-    type: str  # "tweet" | "professional" | "custom"
+    type: Literal["tweet", "professional", "custom"]
     customPrompt: str | None = None
 
+    @model_validator(mode="after")
+    def require_custom_prompt(self) -> "TransformRequest":
+        if self.type == "custom" and not self.customPrompt:
+            raise ValueError("customPrompt required for custom type")
+        return self
+
 
 SOFT_CONSTRAINT_PROMPT = """You are rewriting a transcript excerpt. Follow these rules strictly:
 - Obey the user's instruction exactly.
@@ -72,23 +97,52 @@ SOFT_CONSTRAINT_PROMPT = """You are rewriting a transcript excerpt. Follow these
 
 Return only the rewritten text."""
 
+CUSTOM_PROMPT_PREFIX = SOFT_CONSTRAINT_PROMPT + "\n\nUser instruction:\n"
+CUSTOM_PROMPT_TRANSCRIPT_HEADER = "\n\nTranscript:\n"
+
+TWEET_PROMPT_TEMPLATE = """Condense this to ~280 characters, make it punchy and engaging for Twitter/X. Keep the core insight but make it shareable:
+
+%s
+
+Only return the tweet text, nothing else."""
+
+PROFESSIONAL_PROMPT_TEMPLATE = """Rewrite this in a formal, professional tone suitable for business communication. Remove casual language and structure it clearly:
+
+%s
+
+Only return the professional version, nothing else."""
+
+WORD_PATTERN = re.compile(r"\b\w+\b")
+LIST_MARKER_PATTERN = re.compile(r"^\s*(?:[-*•]|\d+\.)\s+", re.MULTILINE)
+LIST_MARKER_START_CHARS = frozenset("-*•")
+
 
 def build_custom_prompt(user_instruction: str, transcript: str) -> str:
     sanitized_instruction = user_instruction.strip()
-    return (
-        f"{SOFT_CONSTRAINT_PROMPT}\n\n"
-        f"User instruction:\n{sanitized_instruction}\n\n"
-        f"Transcript:\n{transcript.strip()}\n"
+    return "".join(
+        (
+            CUSTOM_PROMPT_PREFIX,
+            sanitized_instruction,
+            CUSTOM_PROMPT_TRANSCRIPT_HEADER,
+            transcript.strip(),
+            "\n",
+        )
     )
 
 
 def analyze_custom_output(text: str) -> Dict[str, Any]:
     cleaned = text.strip()
-    word_count = len(re.findall(r"\b\w+\b", cleaned))
-    has_paragraph_breaks = "\n\n" in cleaned or cleaned.count("\n") > 0
-    has_list_markers = bool(
-        re.search(r"^\s*(?:[-*•]|\d+\.)\s+", cleaned, flags=re.MULTILINE)
-    )
+    word_count = sum(1 for _ in WORD_PATTERN.finditer(cleaned))
+    has_paragraph_breaks = "\n" in cleaned
+    if has_paragraph_breaks:
+        has_list_markers = LIST_MARKER_PATTERN.search(cleaned) is not None
+    else:
+        # Single-line output: a list marker can only appear at the very start,
+        # so skip the multiline scan unless the first character could begin one.
+        first_char = cleaned[:1]
+        has_list_markers = (
+            first_char in LIST_MARKER_START_CHARS or first_char.isdigit()
+        ) and LIST_MARKER_PATTERN.match(cleaned) is not None
 
     violations: List[str] = []
     if word_count > 120:
@@ -110,6 +164,13 @@ async def transcribe_audio_endpoint(audio: UploadFile = File(...)) -> Dict[str,
     try:
         logger.info("transcribe_started: filename=%s", audio.filename)
 
+        # Starlette already spooled large uploads to disk and knows their size,
+        # so reject oversized clips before pulling them into memory.
+        if audio.size is not None and audio.size > MAX_AUDIO_BYTES:
+            raise UnsupportedAudioError(
+                f"Audio rejected (too_large): size={audio.size} bytes exceeds {MAX_AUDIO_BYTES}"
+            )
+
         contents = await audio.read()
         file_size = len(contents)
         logger.info("audio_received: size=%s bytes", file_size)
@@ -118,6 +179,8 @@ async def transcribe_audio_endpoint(audio: UploadFile = File(...)) -> Dict[str,
 
         logger.info("transcribe_finished: session_id=%s", result.get("sessionId"))
         return result
+    except UnsupportedAudioError as exc:
+        raise HTTPException(status_code=400, detail={"error": str(exc)}) from exc
     except Exception as exc:  # pragma: no cover - defensive logging
         logger.error("transcribe_failed: %s", exc, exc_info=True)
         raise HTTPException(
@@ -133,30 +196,14 @@ async def transform_text(request: TransformRequest):
     try:
         logger.info("transform_started: type=%s", request.type)
 
-        import google.generativeai as genai
-        from api.config import GEMINI_MODEL_NAME
-
         if request.type == "tweet":
-            prompt = f"""Condense this to ~280 characters, make it punchy and engaging for Twitter/X. Keep the core insight but make it shareable:
-
-{request.text}
-
-Only return the tweet text, nothing else."""
+            prompt = TWEET_PROMPT_TEMPLATE % request.text
         elif request.type == "professional":
-            prompt = f"""Rewrite this in a formal, professional tone suitable for business communication. Remove casual language and structure it clearly:
-
-{request.text}
-
-Only return the professional version, nothing else."""
-        elif request.type == "custom":
-            if not request.customPrompt:
-                raise HTTPException(status_code=400, detail="customPrompt required for custom type")
-            prompt = build_custom_prompt(request.customPrompt, request.text)
+            prompt = PROFESSIONAL_PROMPT_TEMPLATE % request.text
         else:
-            raise HTTPException(status_code=400, detail="Invalid type. Use: tweet, professional, or custom")
+            prompt = build_custom_prompt(request.customPrompt, request.text)
 
-        model = genai.GenerativeModel(GEMINI_MODEL_NAME)
-        response = model.generate_content(prompt)
+        response = await generate_content(prompt)
         result_text = (response.text or "").strip()
 
         response_payload: Dict[str, Any] = {"text": result_text}
@@ -171,8 +218,6 @@ Only return the professional version, nothing else."""
 
         logger.info("transform_finished")
         return response_payload
-    except HTTPException:
-        raise
     except Exception as exc:
         logger.error("transform_failed: %s", exc, exc_info=True)
         raise HTTPException(status_code=500, detail=str(exc))
@@ -182,7 +227,7 @@ Only return the professional version, nothing else."""
 # Error handler for debugging
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
-    logger.error(f"unhandled_exception: {str(exc)}", exc_info=True)
+    logger.error("unhandled_exception: %s", exc, exc_info=True)
     return {
         "error": "Internal server error",
         "detail": str(exc),
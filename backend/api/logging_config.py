@@ -0,0 +1,17 @@
+import logging
+
+# Vercel stamps each log line itself, so keep the record format light
+LOG_FORMAT = "%(asctime)s %(levelname)s %(message)s"
+LOG_DATE_FORMAT = "%H:%M:%S"
+
+
+def configure_logging(level: int = logging.INFO) -> None:
+    """Attach a stream handler to the root logger unless one already exists."""
+    root = logging.getLogger()
+    if root.handlers:
+        return
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(fmt=LOG_FORMAT, datefmt=LOG_DATE_FORMAT))
+    root.addHandler(handler)
+    root.setLevel(level)
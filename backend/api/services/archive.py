@@ -2,18 +2,47 @@ import asyncio
 import json
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from urllib.parse import quote, urlsplit
 
 try:
     import httpx
 except ImportError:  # pragma: no cover - httpx is optional depending on backend
     httpx = None  # type: ignore
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - fall back to the stdlib encoder
+    orjson = None  # type: ignore
+
 logger = logging.getLogger(__name__)
 
+BytesLike = Union[bytes, bytearray, memoryview]
+
+# Dedicated pool so archive writes never queue behind the default executor
+_ARCHIVE_IO_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="archive-io")
+
+
+def _dump_json(payload: Dict[str, Any]) -> bytes:
+    """Serialize an archive artifact compactly (no indentation) as UTF-8."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _utc_timestamp() -> str:
+    """Current UTC time as an ISO-8601 string with a ``Z`` suffix."""
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _write_file(path: Path, data: BytesLike) -> None:
+    with open(path, "wb") as handle:
+        handle.write(data)
+
 
 @dataclass
 class AudioPayload:
@@ -22,7 +51,8 @@ class AudioPayload:
     filename: str
     content_type: str
     size_bytes: int
-    data: bytes
+    # Any buffer; the local backend writes it to disk without copying
+    data: BytesLike
 
 
 class ArchiveBackend:
@@ -42,6 +72,12 @@ class ArchiveBackend:
     ) -> Dict[str, Any]:
         raise NotImplementedError
 
+    async def aclose(self) -> None:
+        """Release any long-lived resources held by the backend."""
+
+
+_NULL_RESULT: Dict[str, Any] = {"enabled": False, "backend": ArchiveBackend.backend_name}
+
 
 class NullBackend(ArchiveBackend):
     """No-op backend when archiving is disabled."""
@@ -56,15 +92,16 @@ class NullBackend(ArchiveBackend):
         audio: Optional[AudioPayload],
         metadata: Dict[str, Any],
     ) -> Dict[str, Any]:
-        return {"enabled": False, "backend": self.backend_name}
+        return dict(_NULL_RESULT)
 
 
 class LocalFilesystemBackend(ArchiveBackend):
     backend_name = "local"
 
     def __init__(self, base_directory: str) -> None:
+        # Directories are created on first write, inside the executor, so
+        # constructing the backend never blocks the event loop.
         self.base_path = Path(base_directory)
-        self.base_path.mkdir(parents=True, exist_ok=True)
 
     async def store(
         self,
@@ -76,39 +113,41 @@ class LocalFilesystemBackend(ArchiveBackend):
         audio: Optional[AudioPayload],
         metadata: Dict[str, Any],
     ) -> Dict[str, Any]:
+        metadata_payload = {
+            **metadata,
+            "archivedAt": _utc_timestamp(),
+        }
+
         def _write_to_disk() -> Dict[str, Any]:
-            session_path = self.base_path / session_id
+            # Sessions are sharded by the first two characters of their id
+            session_path = self.base_path / session_id[:2] / session_id
             session_path.mkdir(parents=True, exist_ok=True)
 
             artifacts: Dict[str, Any] = {}
 
             if audio and audio.data:
                 audio_path = session_path / audio.filename
-                audio_path.write_bytes(audio.data)
+                _write_file(audio_path, audio.data)
                 artifacts["audioPath"] = str(audio_path)
 
             strict_path = session_path / "strict.json"
-            strict_path.write_text(json.dumps(strict_variants, ensure_ascii=True, indent=2))
+            _write_file(strict_path, _dump_json(strict_variants))
             artifacts["strictPath"] = str(strict_path)
 
             light_path = session_path / "light.json"
-            light_path.write_text(json.dumps(light_variants, ensure_ascii=True, indent=2))
+            _write_file(light_path, _dump_json(light_variants))
             artifacts["lightPath"] = str(light_path)
 
             raw_path = session_path / "raw_response.txt"
-            raw_path.write_text(raw_response_text)
+            _write_file(raw_path, raw_response_text.encode("utf-8"))
             artifacts["rawResponsePath"] = str(raw_path)
 
             prompt_path = session_path / "prompt.txt"
-            prompt_path.write_text(prompt)
+            _write_file(prompt_path, prompt.encode("utf-8"))
             artifacts["promptPath"] = str(prompt_path)
 
             metadata_path = session_path / "metadata.json"
-            metadata_payload = {
-                **metadata,
-                "archivedAt": datetime.utcnow().isoformat() + "Z",
-            }
-            metadata_path.write_text(json.dumps(metadata_payload, ensure_ascii=True, indent=2))
+            _write_file(metadata_path, _dump_json(metadata_payload))
             artifacts["metadataPath"] = str(metadata_path)
 
             return {
@@ -117,7 +156,11 @@ class LocalFilesystemBackend(ArchiveBackend):
                 "artifacts": artifacts,
             }
 
-        return await asyncio.to_thread(_write_to_disk)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_ARCHIVE_IO_EXECUTOR, _write_to_disk)
+
+
+VERCEL_BLOB_API_URL = "https://blob.vercel-storage.com/"
 
 
 class VercelBlobBackend(ArchiveBackend):
@@ -128,8 +171,27 @@ class VercelBlobBackend(ArchiveBackend):
             raise RuntimeError("httpx is required for Vercel Blob archiving")
 
         self.token = token
+        self._authorization = f"Bearer {token}"
         self.prefix = prefix.strip("/") or "sessions"
         self.timeout = httpx.Timeout(30.0)
+        self._client: Optional["httpx.AsyncClient"] = None
+        # Public store host (e.g. https://<id>.public.blob.vercel-storage.com),
+        # learned from the first upload response
+        self._blob_host: Optional[str] = None
+
+    def _get_client(self) -> "httpx.AsyncClient":
+        """Return the shared client, creating it on first use."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_keepalive_connections=20, keepalive_expiry=60.0),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     async def store(
         self,
@@ -144,44 +206,70 @@ class VercelBlobBackend(ArchiveBackend):
         if httpx is None:  # pragma: no cover - defensive
             raise RuntimeError("httpx is required for Vercel Blob archiving")
 
-        artifacts: Dict[str, Any] = {}
-        base_key = f"{self.prefix}/{session_id}"
+        key_prefix = f"{self.prefix}/{session_id}/"
+        metadata_payload = {
+            **metadata,
+            "archivedAt": _utc_timestamp(),
+        }
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            if audio and audio.data:
-                key = f"{base_key}/{audio.filename}"
-                artifacts["audioUrl"] = await self._upload(
-                    client, key, audio.data, audio.content_type or "application/octet-stream"
+        # (artifact name, blob key, body, content type) - uploaded concurrently
+        uploads: List[Tuple[str, str, bytes, str]] = []
+        if audio and audio.data:
+            uploads.append(
+                (
+                    "audioUrl",
+                    key_prefix + audio.filename,
+                    # httpx only sends ``bytes`` as a single body
+                    audio.data if isinstance(audio.data, bytes) else bytes(audio.data),
+                    audio.content_type or "application/octet-stream",
                 )
-
-            strict_bytes = json.dumps(strict_variants, ensure_ascii=True, indent=2).encode("utf-8")
-            artifacts["strictUrl"] = await self._upload(
-                client, f"{base_key}/strict.json", strict_bytes, "application/json"
-            )
-
-            light_bytes = json.dumps(light_variants, ensure_ascii=True, indent=2).encode("utf-8")
-            artifacts["lightUrl"] = await self._upload(
-                client, f"{base_key}/light.json", light_bytes, "application/json"
-            )
-
-            raw_bytes = raw_response_text.encode("utf-8")
-            artifacts["rawResponseUrl"] = await self._upload(
-                client, f"{base_key}/raw_response.txt", raw_bytes, "text/plain"
             )
+        uploads.extend(
+            [
+                (
+                    "strictUrl",
+                    key_prefix + "strict.json",
+                    _dump_json(strict_variants),
+                    "application/json",
+                ),
+                (
+                    "lightUrl",
+                    key_prefix + "light.json",
+                    _dump_json(light_variants),
+                    "application/json",
+                ),
+                (
+                    "rawResponseUrl",
+                    key_prefix + "raw_response.txt",
+                    raw_response_text.encode("utf-8"),
+                    "text/plain",
+                ),
+                (
+                    "promptUrl",
+                    key_prefix + "prompt.txt",
+                    prompt.encode("utf-8"),
+                    "text/plain",
+                ),
+                (
+                    "metadataUrl",
+                    key_prefix + "metadata.json",
+                    _dump_json(metadata_payload),
+                    "application/json",
+                ),
+            ]
+        )
 
-            prompt_bytes = prompt.encode("utf-8")
-            artifacts["promptUrl"] = await self._upload(
-                client, f"{base_key}/prompt.txt", prompt_bytes, "text/plain"
+        client = self._get_client()
+        urls = await asyncio.gather(
+            *(
+                self._upload(client, key, data, content_type)
+                for _, key, data, content_type in uploads
             )
+        )
 
-            metadata_payload = {
-                **metadata,
-                "archivedAt": datetime.utcnow().isoformat() + "Z",
-            }
-            metadata_bytes = json.dumps(metadata_payload, ensure_ascii=True, indent=2).encode("utf-8")
-            artifacts["metadataUrl"] = await self._upload(
-                client, f"{base_key}/metadata.json", metadata_bytes, "application/json"
-            )
+        artifacts: Dict[str, Any] = {
+            name: url for (name, _, _, _), url in zip(uploads, urls)
+        }
 
         return {
             "enabled": True,
@@ -190,32 +278,54 @@ class VercelBlobBackend(ArchiveBackend):
         }
 
     async def _upload(self, client: "httpx.AsyncClient", key: str, data: bytes, content_type: str) -> str:
-        url = f"https://blob.vercel-storage.com/{key}"
+        url = VERCEL_BLOB_API_URL + key
         headers = {
-            "Authorization": f"Bearer {self.token}",
+            "Authorization": self._authorization,
             "Content-Type": content_type,
+            # Store blobs under the exact key so their public URLs are predictable
+            "x-add-random-suffix": "0",
         }
         response = await client.put(url, headers=headers, content=data)
         response.raise_for_status()
 
+        if self._blob_host is not None:
+            return self._download_url(self._blob_host, key)
+
         try:
             payload = response.json()
         except ValueError:  # pragma: no cover - non-JSON response
             payload = {}
 
+        download_url = payload.get("downloadUrl")
+        blob_url = payload.get("url")
+        if download_url and blob_url:
+            parts = urlsplit(blob_url)
+            blob_host = f"{parts.scheme}://{parts.netloc}"
+            # Only skip JSON decoding for later uploads once the derived URL
+            # provably matches what the API returns.
+            if self._download_url(blob_host, key) == download_url:
+                self._blob_host = blob_host
+
         return (
-            payload.get("downloadUrl")
-            or payload.get("url")
+            download_url
+            or blob_url
             or payload.get("pathname")
             or url
         )
 
+    @staticmethod
+    def _download_url(blob_host: str, key: str) -> str:
+        return f"{blob_host}/{quote(key)}?download=1"
+
 
 class ArchiveManager:
     """Factory/manager that delegates persistence to a concrete backend."""
 
-    def __init__(self, backend: ArchiveBackend) -> None:
+    def __init__(self, backend: ArchiveBackend, background: bool = False) -> None:
         self._backend = backend
+        # When set, persist_session schedules the write and returns right away
+        self._background = background
+        self._pending: Set["asyncio.Task[Dict[str, Any]]"] = set()
 
     @classmethod
     def from_env(cls) -> "ArchiveManager":
@@ -249,7 +359,13 @@ class ArchiveManager:
                     "archive_backend_disabled: mode=%s reason=unrecognized", storage_mode
                 )
 
-        return cls(backend)
+        background = os.getenv("ARCHIVE_BACKGROUND", "false").strip().lower() in {"1", "true", "yes"}
+        return cls(backend, background=background)
+
+    async def aclose(self) -> None:
+        if self._pending:
+            await asyncio.gather(*self._pending)
+        await self._backend.aclose()
 
     async def persist_session(
         self,
@@ -260,6 +376,37 @@ class ArchiveManager:
         light_variants: Dict[str, Any],
         audio: Optional[AudioPayload],
         metadata: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        # Archiving is disabled by default; skip the coroutine round-trip.
+        if isinstance(self._backend, NullBackend):
+            return dict(_NULL_RESULT)
+
+        store = self._store(
+            session_id=session_id,
+            prompt=prompt,
+            raw_response_text=raw_response_text,
+            strict_variants=strict_variants,
+            light_variants=light_variants,
+            audio=audio,
+            metadata=metadata,
+        )
+        if not self._background:
+            return await store
+
+        task = asyncio.create_task(store)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return {"enabled": True, "backend": self._backend.backend_name, "status": "pending"}
+
+    async def _store(
+        self,
+        session_id: str,
+        prompt: str,
+        raw_response_text: str,
+        strict_variants: Dict[str, Any],
+        light_variants: Dict[str, Any],
+        audio: Optional[AudioPayload],
+        metadata: Dict[str, Any],
     ) -> Dict[str, Any]:
         try:
             result = await self._backend.store(
@@ -0,0 +1,42 @@
+import hashlib
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+def content_hash(data: Any) -> str:
+    """SHA-256 hex digest of bytes or text (text is hashed as UTF-8)."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class LRUCache:
+    """Small in-process least-recently-used cache.
+
+    Entries live only as long as the worker process, which is enough to absorb
+    client retries and repeated uploads of the same clip.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+__all__ = [
+    "LRUCache",
+    "content_hash",
+]
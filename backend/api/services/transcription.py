@@ -1,25 +1,47 @@
+import asyncio
+import io
 import json
 import logging
+import mimetypes
+import random
+import re
+import shutil
+import tempfile
 import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, NoReturn
+from typing import IO, Any, AsyncIterator, Dict, List, Optional, Tuple, NoReturn
 
 import google.generativeai as genai
+import orjson
+from google.api_core.exceptions import ResourceExhausted
 
-from api.config import ENV, GEMINI_API_KEY, GEMINI_MODEL_NAME
+from api.config import settings
 from api.services.archive import AudioPayload, get_archive_manager
+from api.services.cache import LRUCache, content_hash
 
 logger = logging.getLogger(__name__)
 
 # Configure Gemini client once at import time
-genai.configure(api_key=GEMINI_API_KEY)
+genai.configure(api_key=settings.gemini_api_key)
+_model = genai.GenerativeModel(settings.gemini_model_name)
+
+# Bound in-flight Gemini requests so bursts queue here instead of tripping
+# the project's rate limit; 429s that still happen are retried with backoff.
+_gemini_slots = asyncio.Semaphore(settings.gemini_max_concurrency)
+GEMINI_MAX_ATTEMPTS = 3
+GEMINI_RETRY_BASE_SECONDS = 1.0
+GEMINI_RETRY_JITTER = 0.25
 
 PROMPT = """
 Transcribe this audio and return JSON in this EXACT format (no other text):
 {
   "originalStrict": "word-for-word transcription in the original language spoken",
-  "englishStrict": "word-for-word English translation"
+  "englishStrict": "word-for-word English translation",
+  "originalLight": "light edit of originalStrict",
+  "englishLight": "light edit of englishStrict"
 }
 
 VARIANT SPECIFICATIONS:
@@ -33,7 +55,13 @@ englishStrict - Clean verbatim English:
 • Direct word-for-word translation with filler words removed
 • Maintain spoken structure even if awkward
 
-Formatting guidelines for both variants:
+originalLight / englishLight - Light edit of the matching strict variant:
+• Remove repetitions and fix grammar and punctuation to create complete sentences
+• You may reorder up to 30% of the sentences to improve clarity
+• PRESERVE the exact vocabulary - do not paraphrase or use synonyms
+• Same language as the matching strict variant
+
+Formatting guidelines for all variants:
 • Group related sentences into short paragraphs (2-4 sentences each)
 • Separate paragraphs with exactly one blank line (double newline) and never add blank lines at the start or end
 • Keep the writing as continuous prose—no bullet points, numbering, or headings
@@ -45,29 +73,99 @@ Only return valid JSON, nothing else.
 CONTINUE_PROMPT_TEMPLATE = """
 The previous response stopped mid-thought. You must continue the transcript until the audio ends.
 
-Partial transcript that you already returned:
-{partial_json}
+Your originalStrict transcript so far ends with:
+{original_tail}
+
+Your englishStrict transcript so far ends with:
+{english_tail}
 
 Return ONLY the missing continuation in this exact JSON shape (no other text):
-{
+{{
   "originalStrict": "continuation text only, do not repeat prior content",
   "englishStrict": "continuation text only, do not repeat prior content"
-}
+}}
 
-Do not restate any sentences that appear in the partial transcript. Continue seamlessly from where it stops and include the complete remainder of the audio.
+Continue seamlessly from right after each ending above, do not repeat it, and include the complete remainder of the audio.
 """
 
 MAX_CONTINUATION_ATTEMPTS = 1
+CONTINUATION_TAIL_CHARS = 300
+MAX_AUDIO_BYTES = 25 * 1024 * 1024
+ALLOWED_AUDIO_MIME_TYPES = frozenset(
+    {
+        "audio/m4a",
+        "audio/x-m4a",
+        "audio/mp4",
+        "audio/aac",
+        "audio/mpeg",
+        "audio/mp3",
+        "audio/wav",
+        "audio/x-wav",
+        "audio/ogg",
+        "audio/webm",
+        "audio/flac",
+        "audio/aiff",
+    }
+)
+# Generic client types (e.g. curl -F) carry no format; infer it from the filename
+GENERIC_MIME_TYPES = frozenset({"application/octet-stream", "binary/octet-stream"})
+DEFAULT_AUDIO_MIME_TYPE = "audio/m4a"
+# Clips at least this large are re-encoded to Opus when ffmpeg is available
+TRANSCODE_MIN_BYTES = 2 * 1024 * 1024
+_FFMPEG_PATH = shutil.which("ffmpeg")
+# Gemini caps inline request payloads at 20 MB; larger clips go through the Files API
+INLINE_AUDIO_MAX_BYTES = 15 * 1024 * 1024
+# Uploaded files must leave PROCESSING within this window or the request fails
+FILE_PROCESSING_POLL_SECONDS = 1
+FILE_PROCESSING_TIMEOUT_SECONDS = 60
 MIN_TRUNCATION_LENGTH = 200
+TERMINAL_CHARS = frozenset({'.', '!', '?', '"', "'", ')', '…', '”', '’'})
+
+# Opening fence with optional language tag; captures up to the closing fence
+# (or the end of the text when the fence is never closed).
+CODE_FENCE_PATTERN = re.compile(r"```(?:json|text)?(.*?)(?:```|\Z)", re.DOTALL)
+
+# Ask Gemini for JSON output directly so fences and stray prose are rare
+STRICT_GENERATION_CONFIG = {"response_mime_type": "application/json"}
+
+JSON_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+PYTHON_JSON_LITERALS = {"None": "null", "True": "true", "False": "false"}
+
+# Part of every cache key so edits to the prompts invalidate cached results
+PROMPT_VERSION = content_hash(PROMPT + CONTINUE_PROMPT_TEMPLATE)[:12]
+
+_transcription_cache = LRUCache(settings.transcription_cache_size)
+_light_edit_cache = LRUCache(settings.transcription_cache_size * 2)
+
+
+async def generate_content(contents: Any, **kwargs: Any) -> Any:
+    """Call Gemini through the shared concurrency gate, retrying 429s with backoff."""
+    attempt = 1
+    while True:
+        try:
+            async with _gemini_slots:
+                return await _model.generate_content_async(contents, **kwargs)
+        except ResourceExhausted as exc:
+            if attempt >= GEMINI_MAX_ATTEMPTS:
+                raise
+            delay = GEMINI_RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+            delay *= 1 + random.uniform(-GEMINI_RETRY_JITTER, GEMINI_RETRY_JITTER)
+            logger.warning(
+                "gemini_rate_limited: attempt=%s retry_in=%.2fs error=%s", attempt, delay, exc
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
 
 
-async def apply_light_edit(text: str, max_move_ratio: float = 0.3) -> str:
+async def apply_light_edit(text: str, max_move_ratio: float = 0.3) -> Tuple[str, bool]:
     """
     Apply light editing with sentence reordering:
     - Remove filler words (um, uh, like, etc.)
     - Fix grammar and punctuation
     - Reorder up to 30% of sentences for better flow
     - Preserve exact vocabulary
+    Returns the edited text and whether Gemini succeeded (False means the
+    input text was returned unchanged).
     """
     prompt = (
         "You will receive a passage of text.\n"
@@ -84,30 +182,31 @@ async def apply_light_edit(text: str, max_move_ratio: float = 0.3) -> str:
         "Text:\n" + text
     )
 
+    cache_key = ":".join(
+        (content_hash(text), str(max_move_ratio), settings.gemini_model_name, PROMPT_VERSION)
+    )
+    cached = _light_edit_cache.get(cache_key)
+    if cached is not None:
+        return cached, True
+
     try:
-        model = genai.GenerativeModel(GEMINI_MODEL_NAME)
-        response = model.generate_content(prompt)
-        result_text = (response.text or "").strip()
-
-        if result_text.startswith("```"):
-            segments = result_text.split("```")
-            if len(segments) >= 2:
-                result_text = segments[1]
-                if result_text.startswith("json") or result_text.startswith("text"):
-                    result_text = result_text[4:]
-            result_text = result_text.strip()
-
-        return result_text
+        response = await generate_content(prompt)
+        result_text = _strip_code_fence(response.text or "")
+
+        _light_edit_cache.set(cache_key, result_text)
+        return result_text, True
     except Exception as exc:  # pragma: no cover - defensive logging
         logger.error("light_edit_failed: %s", exc, exc_info=True)
         # Return original text if editing fails
-        return text
+        return text, False
 
 
-async def translate_to_language(text: str, target_language: str) -> str:
+async def translate_to_language(text: str, target_language: str) -> Tuple[str, bool]:
     """
     Translate text to the specified target language.
     Preserves meaning and formatting from the source text.
+    Returns the translation and whether Gemini succeeded (False means the
+    input text was returned unchanged).
     """
     prompt = (
         f"Translate the following text to {target_language}.\n"
@@ -117,24 +216,69 @@ async def translate_to_language(text: str, target_language: str) -> str:
     )
 
     try:
-        model = genai.GenerativeModel(GEMINI_MODEL_NAME)
-        response = model.generate_content(prompt)
-        result_text = (response.text or "").strip()
-
-        # Strip markdown code fences if present
-        if result_text.startswith("```"):
-            segments = result_text.split("```")
-            if len(segments) >= 2:
-                result_text = segments[1]
-                if result_text.startswith("json") or result_text.startswith("text"):
-                    result_text = result_text[4:]
-            result_text = result_text.strip()
-
-        return result_text
+        response = await generate_content(prompt)
+        result_text = _strip_code_fence(response.text or "")
+
+        return result_text, True
     except Exception as exc:  # pragma: no cover - defensive logging
         logger.error("translation_failed: language=%s error=%s", target_language, exc, exc_info=True)
         # Return original text if translation fails
-        return text
+        return text, False
+
+
+class UnsupportedAudioError(ValueError):
+    """Raised for uploads that are rejected before contacting Gemini."""
+
+
+def _resolve_mime_type(content_type: Optional[str], filename: str) -> str:
+    """Use the declared type unless it is missing or generic."""
+    if content_type and content_type.split(";", 1)[0].strip().lower() not in GENERIC_MIME_TYPES:
+        return content_type
+    guessed, _ = mimetypes.guess_type(filename)
+    return guessed if guessed in ALLOWED_AUDIO_MIME_TYPES else DEFAULT_AUDIO_MIME_TYPE
+
+
+def _validate_audio(file_size: int, mime_type: str, session_id: str) -> None:
+    reason = None
+    if file_size == 0:
+        reason = "empty"
+    elif file_size > MAX_AUDIO_BYTES:
+        reason = "too_large"
+    elif mime_type.split(";", 1)[0].strip().lower() not in ALLOWED_AUDIO_MIME_TYPES:
+        reason = "unsupported_mime_type"
+
+    if reason is not None:
+        logger.warning(
+            "audio_rejected: session_id=%s reason=%s size=%s mime_type=%s",
+            session_id,
+            reason,
+            file_size,
+            mime_type,
+        )
+        raise UnsupportedAudioError(
+            f"Audio rejected ({reason}): size={file_size} bytes, type={mime_type}"
+        )
+
+
+@dataclass(frozen=True)
+class GeneratedVariants:
+    """Everything Gemini produced for one clip; cached by audio content hash."""
+
+    strict_variants: Dict[str, str]
+    light_variants: Dict[str, str]
+    raw_response_text: str
+    continuation_attempts: int
+    truncation_detected: bool
+    truncated_after_retries: bool
+    # True when a light edit or translation failed and its input was used instead
+    used_fallback: bool
+    # True when a Gemini response hit the token limit or had to be closed by repair
+    output_cut_off: bool
+
+    @property
+    def cacheable(self) -> bool:
+        """Degraded results are not cached so a re-upload retries them."""
+        return not (self.used_fallback or self.truncated_after_retries or self.output_cut_off)
 
 
 async def transcribe_audio(
@@ -145,7 +289,7 @@ async def transcribe_audio(
     """Send audio bytes to Gemini and return transcription variants."""
     try:
         safe_name = Path(filename).name if filename else "recording.m4a"
-        mime_type = content_type or "audio/m4a"
+        mime_type = _resolve_mime_type(content_type, safe_name)
         file_size = len(audio_content) if audio_content is not None else 0
 
         session_id = uuid.uuid4().hex
@@ -157,112 +301,28 @@ async def transcribe_audio(
             mime_type,
             file_size,
         )
+        _validate_audio(file_size, mime_type, session_id)
 
-        # Step 1: Get strict variants from Gemini
-        strict_variants, raw_response_text = await _request_strict_variants(
-            audio_content,
-            mime_type,
-            PROMPT,
-            session_id=session_id,
-        )
-        logger.info("strict_transcription_successful: session_id=%s", session_id)
-
-        continuation_raw_responses: List[str] = []
-        retry_count = 0
-        needs_continuation = any(
-            _is_truncated(strict_variants.get(field, ""))
-            for field in ("originalStrict", "englishStrict")
-        )
-
-        truncation_detected = needs_continuation
-
-        while needs_continuation and retry_count < MAX_CONTINUATION_ATTEMPTS:
-            retry_count += 1
-            logger.warning(
-                "strict_transcription_truncated_detected: session_id=%s attempt=%s",
-                session_id,
-                retry_count,
-            )
-
-            partial_json = json.dumps(
-                {
-                    "originalStrict": strict_variants.get("originalStrict", ""),
-                    "englishStrict": strict_variants.get("englishStrict", ""),
-                },
-                ensure_ascii=True,
-                indent=2,
-            )
-            continue_prompt = CONTINUE_PROMPT_TEMPLATE.format(partial_json=partial_json)
-            try:
-                continuation_variants_raw, continuation_raw = await _request_strict_variants(
-                    audio_content,
-                    mime_type,
-                    continue_prompt,
-                    session_id=session_id,
-                )
-            except (json.JSONDecodeError, ValueError) as exc:
-                logger.warning(
-                    "strict_transcription_continuation_parse_failed: session_id=%s attempt=%s error=%s",
-                    session_id,
-                    retry_count,
-                    exc,
-                )
-                break
-
-            continuation_raw_responses.append(continuation_raw.strip())
-
-            if not isinstance(continuation_variants_raw, dict):
-                logger.warning(
-                    "strict_transcription_continuation_non_dict: session_id=%s attempt=%s type=%s",
-                    session_id,
-                    retry_count,
-                    type(continuation_variants_raw).__name__,
-                )
-                break
-
-            continuation_variants = continuation_variants_raw
-
-            for field in ("originalStrict", "englishStrict"):
-                addition_raw = continuation_variants.get(field)
-                addition = (addition_raw or "").strip()
-                if not addition:
-                    continue
-                base = strict_variants.get(field, "")
-                separator = "" if not base or base.endswith((" ", "\n")) else " "
-                strict_variants[field] = f"{base}{separator}{addition}"
-
-            needs_continuation = any(
-                _is_truncated(strict_variants.get(field, ""))
-                for field in ("originalStrict", "englishStrict")
-            )
-
-        if needs_continuation:
-            logger.warning("strict_transcription_still_truncated: session_id=%s", session_id)
+        cache_key = _transcription_cache_key(audio_content, mime_type)
+        variants = _transcription_cache.get(cache_key)
+        cache_hit = variants is not None
+        if cache_hit:
+            logger.info("transcription_cache_hit: session_id=%s", session_id)
         else:
-            logger.info(
-                "strict_transcription_continuation_complete: session_id=%s attempts=%s",
-                session_id,
-                retry_count,
+            gemini_audio, gemini_mime_type = await _maybe_transcode(
+                audio_content, mime_type, session_id
             )
-
-        # Step 2: Apply light editing to create light variants
-        logger.info("applying_light_edits: session_id=%s", session_id)
-        original_light = await apply_light_edit(strict_variants["originalStrict"])
-        english_light = await apply_light_edit(strict_variants["englishStrict"])
-
-        # Step 3: Apply translations to additional languages
-        logger.info("applying_translations: session_id=%s", session_id)
-        french_light = await translate_to_language(english_light, "French")
-        portuguese_light = await translate_to_language(english_light, "Portuguese")
-        russian_light = await translate_to_language(english_light, "Russian")
-
-        light_variants = {
-            "originalLight": original_light,
-            "englishLight": english_light,
-            "frenchLight": french_light,
-            "portugueseLight": portuguese_light,
-            "russianLight": russian_light,
-        }
+            async with _gemini_audio_part(gemini_audio, gemini_mime_type, session_id) as audio_part:
+                variants = await _generate_variants(audio_part, session_id)
+            if variants.cacheable:
+                _transcription_cache.set(cache_key, variants)
+            else:
+                logger.info("transcription_not_cached: session_id=%s", session_id)
+
+        # The cached instance is shared by every hit; hand out copies so
+        # nothing downstream can mutate a later response.
+        strict_variants = dict(variants.strict_variants)
+        light_variants = dict(variants.light_variants)
 
         audio_payload = AudioPayload(
             filename=safe_name,
@@ -272,26 +332,24 @@ async def transcribe_audio(
         )
 
         archive_metadata = {
-            "model": GEMINI_MODEL_NAME,
-            "environment": ENV,
+            "model": settings.gemini_model_name,
+            "environment": settings.env,
             "receivedAt": request_received_at,
             "filename": safe_name,
             "contentType": mime_type,
             "sizeBytes": file_size,
-            "continuationAttempts": retry_count,
-            "truncationDetected": truncation_detected,
-            "truncatedAfterRetries": needs_continuation,
+            "continuationAttempts": variants.continuation_attempts,
+            "truncationDetected": variants.truncation_detected,
+            "truncatedAfterRetries": variants.truncated_after_retries,
+            "outputCutOff": variants.output_cut_off,
+            "cacheHit": cache_hit,
         }
 
         archive_manager = get_archive_manager()
-        raw_payload = raw_response_text.strip()
-        if continuation_raw_responses:
-            continuation_text = "\n\n--- CONTINUATION ---\n\n".join(continuation_raw_responses)
-            raw_payload = f"{raw_payload}\n\n--- CONTINUATION ---\n\n{continuation_text}".strip()
         archive_info = await archive_manager.persist_session(
             session_id=session_id,
             prompt=PROMPT.strip(),
-            raw_response_text=raw_payload,
+            raw_response_text=variants.raw_response_text,
             strict_variants=strict_variants,
             light_variants=light_variants,
             audio=audio_payload,
@@ -309,93 +367,512 @@ async def transcribe_audio(
             "sessionId": session_id,
             "archive": archive_info,
             "originalStrict": strict_variants["originalStrict"],
-            "originalLight": original_light,
+            "originalLight": light_variants["originalLight"],
             "englishStrict": strict_variants["englishStrict"],
-            "englishLight": english_light,
-            "frenchLight": french_light,
-            "portugueseLight": portuguese_light,
-            "russianLight": russian_light,
+            "englishLight": light_variants["englishLight"],
+            "frenchLight": light_variants["frenchLight"],
+            "portugueseLight": light_variants["portugueseLight"],
+            "russianLight": light_variants["russianLight"],
         }
 
         logger.info("transcription_successful: session_id=%s", session_id)
         return result
 
+    except UnsupportedAudioError:
+        raise
     except json.JSONDecodeError as exc:
         logger.error("json_parse_failed: %s", exc, exc_info=True)
         raise ValueError(f"Failed to parse Gemini response as JSON: {exc}") from exc
     except Exception as exc:  # pragma: no cover - defensive logging
         logger.error("transcription_failed: %s", exc, exc_info=True)
         raise
+
+
+async def _maybe_transcode(
+    audio_content: bytes, mime_type: str, session_id: str
+) -> Tuple[bytes, str]:
+    """Re-encode large clips to 16 kHz mono Opus before sending them to Gemini.
+
+    16 kbps Opus is ample for speech and shrinks the upload several-fold.
+    Small clips, hosts without ffmpeg, any transcoding failure, and output
+    that is no smaller than the input all fall back to the original bytes.
+    """
+    if len(audio_content) < TRANSCODE_MIN_BYTES or _FFMPEG_PATH is None:
+        return audio_content, mime_type
+
+    # ffmpeg needs a seekable input: m4a files often store their index last
+    with tempfile.NamedTemporaryFile() as source:
+        await asyncio.to_thread(_write_and_flush, source, audio_content)
+        try:
+            process = await asyncio.create_subprocess_exec(
+                _FFMPEG_PATH,
+                "-nostdin",
+                "-loglevel", "error",
+                "-i", source.name,
+                "-ac", "1",
+                "-ar", "16000",
+                "-c:a", "libopus",
+                "-b:a", "16k",
+                "-f", "ogg",
+                "pipe:1",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except OSError as exc:  # pragma: no cover - defensive logging
+            logger.warning("audio_transcode_failed: session_id=%s error=%s", session_id, exc)
+            return audio_content, mime_type
+        try:
+            transcoded, stderr = await process.communicate()
+        finally:
+            # Don't leave ffmpeg running if the request is cancelled mid-transcode
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+    if process.returncode != 0 or not transcoded:
+        logger.warning(
+            "audio_transcode_failed: session_id=%s returncode=%s error=%s",
+            session_id,
+            process.returncode,
+            stderr.decode("utf-8", "replace").strip()[:300],
+        )
+        return audio_content, mime_type
+
+    if len(transcoded) >= len(audio_content):
+        # Already-compressed or low-bitrate input can grow when re-encoded
+        logger.info(
+            "audio_transcode_skipped: session_id=%s original_size=%s transcoded_size=%s",
+            session_id,
+            len(audio_content),
+            len(transcoded),
+        )
+        return audio_content, mime_type
+
+    logger.info(
+        "audio_transcoded: session_id=%s original_size=%s transcoded_size=%s",
+        session_id,
+        len(audio_content),
+        len(transcoded),
+    )
+    return transcoded, "audio/ogg"
+
+
+def _write_and_flush(handle: IO[bytes], data: bytes) -> None:
+    handle.write(data)
+    handle.flush()
+
+
+@asynccontextmanager
+async def _gemini_audio_part(
+    audio_content: bytes, mime_type: str, session_id: str
+) -> AsyncIterator[Any]:
+    """Yield the audio as a Gemini content part.
+
+    Small clips are sent inline. Larger ones are uploaded once through the
+    Files API so the strict request and any continuation reference the same
+    file instead of re-sending the bytes; the file is deleted afterwards.
+    """
+    if len(audio_content) <= INLINE_AUDIO_MAX_BYTES:
+        yield {"inline_data": {"mime_type": mime_type, "data": audio_content}}
+        return
+
+    uploaded = await asyncio.to_thread(
+        genai.upload_file, io.BytesIO(audio_content), mime_type=mime_type
+    )
+    logger.info(
+        "gemini_audio_uploaded: session_id=%s file=%s", session_id, uploaded.name
+    )
+    try:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + FILE_PROCESSING_TIMEOUT_SECONDS
+        while uploaded.state.name == "PROCESSING":
+            if loop.time() >= deadline:
+                raise TimeoutError(
+                    f"Gemini file {uploaded.name} still processing after "
+                    f"{FILE_PROCESSING_TIMEOUT_SECONDS}s"
+                )
+            await asyncio.sleep(FILE_PROCESSING_POLL_SECONDS)
+            uploaded = await asyncio.to_thread(genai.get_file, uploaded.name)
+        if uploaded.state.name != "ACTIVE":
+            raise RuntimeError(
+                f"Gemini file {uploaded.name} is not usable: state={uploaded.state.name}"
+            )
+        yield uploaded
+    finally:
+        try:
+            await asyncio.to_thread(genai.delete_file, uploaded.name)
+        except Exception as exc:  # pragma: no cover - defensive logging
+            logger.warning(
+                "gemini_audio_delete_failed: session_id=%s file=%s error=%s",
+                session_id,
+                uploaded.name,
+                exc,
+            )
+
+
+async def _generate_variants(audio_part: Any, session_id: str) -> GeneratedVariants:
+    """Run the Gemini pipeline: transcription, fallback light edits, translations."""
+    # Step 1: Get strict (and usually light) variants from Gemini in one call
+    strict_variants, raw_response_text, cut_off = await _request_strict_variants(
+        audio_part,
+        PROMPT,
+        session_id=session_id,
+    )
+    model_light_variants = {
+        field: strict_variants.pop(field, None) for field in ("originalLight", "englishLight")
+    }
+    logger.info("strict_transcription_successful: session_id=%s", session_id)
+
+    continuation_raw_responses: List[str] = []
+    retry_count = 0
+    needs_continuation = any(
+        _is_truncated(strict_variants.get(field, ""))
+        for field in ("originalStrict", "englishStrict")
+    )
+
+    truncation_detected = needs_continuation
+    output_cut_off = cut_off
+
+    while needs_continuation and retry_count < MAX_CONTINUATION_ATTEMPTS:
+        retry_count += 1
+        logger.warning(
+            "strict_transcription_truncated_detected: session_id=%s attempt=%s",
+            session_id,
+            retry_count,
+        )
+
+        # Only the tail of each transcript anchors the continuation; resending
+        # everything would cost tokens linear in the transcript length.
+        continue_prompt = CONTINUE_PROMPT_TEMPLATE.format(
+            original_tail=strict_variants.get("originalStrict", "")[-CONTINUATION_TAIL_CHARS:],
+            english_tail=strict_variants.get("englishStrict", "")[-CONTINUATION_TAIL_CHARS:],
+        )
+        try:
+            continuation_variants_raw, continuation_raw, continuation_cut_off = (
+                await _request_strict_variants(audio_part, continue_prompt, session_id=session_id)
+            )
+        except (json.JSONDecodeError, ValueError) as exc:
+            logger.warning(
+                "strict_transcription_continuation_parse_failed: session_id=%s attempt=%s error=%s",
+                session_id,
+                retry_count,
+                exc,
+            )
+            break
+
+        continuation_raw_responses.append(continuation_raw.strip())
+        output_cut_off = output_cut_off or continuation_cut_off
+
+        if not isinstance(continuation_variants_raw, dict):
+            logger.warning(
+                "strict_transcription_continuation_non_dict: session_id=%s attempt=%s type=%s",
+                session_id,
+                retry_count,
+                type(continuation_variants_raw).__name__,
+            )
+            break
+
+        continuation_variants = continuation_variants_raw
+
+        for field in ("originalStrict", "englishStrict"):
+            addition_raw = continuation_variants.get(field)
+            addition = (addition_raw or "").strip()
+            if not addition:
+                continue
+            base = strict_variants.get(field, "")
+            separator = "" if not base or base.endswith((" ", "\n")) else " "
+            strict_variants[field] = f"{base}{separator}{addition}"
+
+        needs_continuation = any(
+            _is_truncated(strict_variants.get(field, ""))
+            for field in ("originalStrict", "englishStrict")
+        )
+
+    if needs_continuation:
+        logger.warning("strict_transcription_still_truncated: session_id=%s", session_id)
+    else:
+        logger.info(
+            "strict_transcription_continuation_complete: session_id=%s attempts=%s",
+            session_id,
+            retry_count,
+        )
+
+    # Step 2: Use the model's light variants, light-editing only the ones that
+    # are missing or unreliable. After a continuation the light variants only
+    # cover the first part of the audio, and a cut-off response may end inside
+    # one of them, so in both cases they are all regenerated.
+    original_strict = strict_variants["originalStrict"]
+    english_strict = strict_variants["englishStrict"]
+    original_light = english_light = None
+    if not (truncation_detected or cut_off):
+        original_light = _usable_light(model_light_variants["originalLight"])
+        english_light = _usable_light(model_light_variants["englishLight"])
+
+    if original_light is None or english_light is None:
+        logger.info(
+            "applying_light_edits: session_id=%s original=%s english=%s",
+            session_id,
+            original_light is None,
+            english_light is None,
+        )
+
+    light_edit_results: List[bool] = []
+    if original_light is None and english_light is None:
+        if original_strict.strip() == english_strict.strip():
+            # English source audio: both strict variants match, so edit once.
+            english_light, english_ok = await apply_light_edit(english_strict)
+            original_light = english_light
+            light_edit_results.append(english_ok)
+        else:
+            # Failed edits fall back to the strict text, so the two
+            # independent Gemini calls can simply run concurrently.
+            (original_light, original_ok), (english_light, english_ok) = await asyncio.gather(
+                apply_light_edit(original_strict),
+                apply_light_edit(english_strict),
+            )
+            light_edit_results.extend((original_ok, english_ok))
+    elif original_light is None:
+        original_light, original_ok = await apply_light_edit(original_strict)
+        light_edit_results.append(original_ok)
+    elif english_light is None:
+        english_light, english_ok = await apply_light_edit(english_strict)
+        light_edit_results.append(english_ok)
+
+    # Step 3: Apply translations to additional languages
+    logger.info("applying_translations: session_id=%s", session_id)
+    french_light, french_ok = await translate_to_language(english_light, "French")
+    portuguese_light, portuguese_ok = await translate_to_language(english_light, "Portuguese")
+    russian_light, russian_ok = await translate_to_language(english_light, "Russian")
+    translation_results = (french_ok, portuguese_ok, russian_ok)
+
+    light_variants = {
+        "originalLight": original_light,
+        "englishLight": english_light,
+        "frenchLight": french_light,
+        "portugueseLight": portuguese_light,
+        "russianLight": russian_light,
+    }
+
+    raw_payload = raw_response_text.strip()
+    if continuation_raw_responses:
+        continuation_text = "\n\n--- CONTINUATION ---\n\n".join(continuation_raw_responses)
+        raw_payload = f"{raw_payload}\n\n--- CONTINUATION ---\n\n{continuation_text}".strip()
+
+    return GeneratedVariants(
+        strict_variants=strict_variants,
+        light_variants=light_variants,
+        raw_response_text=raw_payload,
+        continuation_attempts=retry_count,
+        truncation_detected=truncation_detected,
+        truncated_after_retries=needs_continuation,
+        used_fallback=not all(light_edit_results) or not all(translation_results),
+        output_cut_off=output_cut_off,
+    )
+
+
+def _usable_light(value: Any) -> Optional[str]:
+    """Return a model-provided light variant if it looks complete."""
+    if not isinstance(value, str) or not value.strip() or _is_truncated(value):
+        return None
+    return value.strip()
+
+
+def _transcription_cache_key(audio_content: bytes, mime_type: str) -> str:
+    return ":".join(
+        (content_hash(audio_content), mime_type, settings.gemini_model_name, PROMPT_VERSION)
+    )
+
+
 def _strip_code_fence(text: str) -> str:
     """Remove leading Markdown code fences the model sometimes returns."""
     cleaned = text.strip()
-    if cleaned.startswith("```"):
-        segments = cleaned.split("```")
-        if len(segments) >= 2:
-            cleaned = segments[1]
-            if cleaned.startswith("json"):
-                cleaned = cleaned[4:]
-            elif cleaned.startswith("text"):
-                cleaned = cleaned[4:]
-        cleaned = cleaned.strip()
+    match = CODE_FENCE_PATTERN.match(cleaned)
+    if match:
+        cleaned = match.group(1).strip()
     return cleaned
 
 
 def _is_truncated(text: str) -> bool:
     """Heuristic to flag transcripts that probably stopped early."""
-    stripped = text.strip()
-    if not stripped:
+    # Walk inwards over surrounding whitespace instead of strip() copying the
+    # whole transcript; only the last character matters.
+    end = len(text)
+    while end and text[end - 1].isspace():
+        end -= 1
+    if not end:
         return False
 
-    if len(stripped) < MIN_TRUNCATION_LENGTH:
+    start = 0
+    while text[start].isspace():
+        start += 1
+    if end - start < MIN_TRUNCATION_LENGTH:
         return False
 
-    terminal_chars = {'.', '!', '?', '"', "'", ')', '…', '”', '’'}
-    if stripped[-1] in terminal_chars:
-        return False
-
-    return True
+    return text[end - 1] not in TERMINAL_CHARS
 
 
 async def _request_strict_variants(
-    audio_content: bytes,
-    mime_type: str,
+    audio_part: Any,
     prompt: str,
     *,
     session_id: Optional[str] = None,
-) -> Tuple[Dict[str, Any], str]:
-    model = genai.GenerativeModel(GEMINI_MODEL_NAME)
-    response = model.generate_content(
-        [
-            {
-                "inline_data": {
-                    "mime_type": mime_type,
-                    "data": audio_content,
-                }
-            },
-            {"text": prompt},
-        ]
+) -> Tuple[Dict[str, Any], str, bool]:
+    """Request and parse strict variants.
+
+    The returned flag is true when the response was cut off, either because
+    Gemini hit its output token limit or because the JSON had to be closed
+    by ``_repair_json``; the last field present may then be incomplete.
+    """
+    response = await generate_content(
+        [audio_part, {"text": prompt}],
+        generation_config=STRICT_GENERATION_CONFIG,
     )
 
     raw_response_text = response.text or ""
+    cut_off = _hit_token_limit(response)
     parsed_text = _strip_code_fence(raw_response_text)
     try:
-        strict_variants = json.loads(parsed_text)
-    except json.JSONDecodeError as exc:
+        strict_variants = orjson.loads(parsed_text)
+    except orjson.JSONDecodeError as exc:
         # Gemini occasionally returns invalid JSON containing literal control
-        # characters (e.g. raw newlines). Retry with loose parsing first.
-        if "Invalid control character" in str(exc):
+        # characters (e.g. raw newlines), which orjson always rejects. Retry
+        # with the stdlib's loose parsing first.
+        try:
+            strict_variants = json.loads(parsed_text, strict=False)
+            logger.warning(
+                "strict_transcription_parse_recovered: session_id=%s mode=loose",
+                session_id,
+            )
+        except json.JSONDecodeError:
+            # Last resort before surfacing the error: patch up truncated or
+            # slightly malformed output rather than paying for a re-request.
             try:
-                strict_variants = json.loads(parsed_text, strict=False)
+                repaired_text, closed_open_values = _repair_json(parsed_text)
+                strict_variants = orjson.loads(repaired_text)
+                cut_off = cut_off or closed_open_values
                 logger.warning(
-                    "strict_transcription_parse_recovered: session_id=%s mode=loose",
+                    "strict_transcription_parse_recovered: session_id=%s mode=repaired cut_off=%s",
                     session_id,
+                    closed_open_values,
                 )
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 strict_variants = _log_and_raise_parse_error(parsed_text, session_id, exc)
+        # Recovered output can still be missing a strict field entirely
+        if not _has_strict_fields(strict_variants):
+            _log_and_raise_parse_error(
+                parsed_text,
+                session_id,
+                ValueError("Gemini response is missing originalStrict or englishStrict"),
+            )
+    return strict_variants, raw_response_text, cut_off
+
+
+def _has_strict_fields(value: Any) -> bool:
+    return isinstance(value, dict) and all(
+        isinstance(value.get(field), str) and value[field].strip()
+        for field in ("originalStrict", "englishStrict")
+    )
+
+
+def _hit_token_limit(response: Any) -> bool:
+    """Return True if Gemini stopped because it ran out of output tokens."""
+    for candidate in getattr(response, "candidates", None) or ():
+        if getattr(candidate.finish_reason, "name", None) == "MAX_TOKENS":
+            return True
+    return False
+
+
+def _repair_json(text: str) -> Tuple[str, bool]:
+    """Best-effort single pass fix-up of almost-valid JSON from the model.
+
+    Escapes raw control characters inside strings, converts Python literals,
+    drops trailing commas, closes an unterminated string and any open
+    brackets, drops an object key that was cut off before its value, and
+    discards text after the top-level object. The flag is true when something
+    had to be closed, i.e. the input was truncated.
+    """
+    start = text.find("{")
+    if start == -1:
+        return text, False
+
+    out: List[str] = []
+    closers: List[str] = []
+    in_string = False
+    escaped = False
+    # Where the current object member starts in ``out`` and how far it got:
+    # "key" until its colon, "colon" until the value starts, then "value".
+    member_start = 0
+    member_state = "value"
+    index = start
+    length = len(text)
+    while index < length:
+        char = text[index]
+        index += 1
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            elif char < " ":
+                char = JSON_CONTROL_ESCAPES.get(char) or f"\\u{ord(char):04x}"
+            out.append(char)
+            continue
+
+        if member_state == "colon" and not char.isspace():
+            member_state = "value"
+        if char == '"':
+            in_string = True
+            out.append(char)
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+            out.append(char)
+            if char == "{":
+                member_start = len(out)
+                member_state = "key"
+        elif char in "}]":
+            _drop_trailing_comma(out)
+            if closers:
+                out.append(closers.pop())
+            member_state = "value"
+            if not closers:
+                break
+        elif char == ":" and closers and closers[-1] == "}":
+            member_state = "colon"
+            out.append(char)
+        elif char == "," and closers and closers[-1] == "}":
+            out.append(char)
+            member_start = len(out)
+            member_state = "key"
+        elif char.isalpha():
+            word_end = index
+            while word_end < length and text[word_end].isalpha():
+                word_end += 1
+            word = text[index - 1 : word_end]
+            out.append(PYTHON_JSON_LITERALS.get(word, word))
+            index = word_end
         else:
-            strict_variants = _log_and_raise_parse_error(parsed_text, session_id, exc)
-    return strict_variants, raw_response_text
+            out.append(char)
+
+    closed_open_values = in_string or bool(closers)
+    if closers and closers[-1] == "}" and member_state != "value":
+        del out[member_start:]
+    elif in_string:
+        if escaped:
+            out.pop()
+        out.append('"')
+    _drop_trailing_comma(out)
+    out.extend(reversed(closers))
+    return "".join(out), closed_open_values
+
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    position = len(out) - 1
+    while position >= 0 and out[position].isspace():
+        position -= 1
+    if position >= 0 and out[position] == ",":
+        del out[position]
 
 
 def _log_and_raise_parse_error(
@@ -0,0 +1,4 @@
+import os
+
+# api.config requires a key at import time; tests never reach Gemini.
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
@@ -0,0 +1,87 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import orjson
+import pytest
+
+from api.services import transcription
+from api.services.transcription import _repair_json
+
+
+def _repaired(text):
+    repaired, closed = _repair_json(text)
+    return orjson.loads(repaired), closed
+
+
+def test_complete_json_is_unchanged():
+    text = '{"originalStrict": "Hola.", "englishStrict": "Hello."}'
+    assert _repair_json(text) == (text, False)
+
+
+def test_truncated_inside_string():
+    value, closed = _repaired('{"originalStrict": "Hola.", "englishStrict": "Hel')
+    assert value == {"originalStrict": "Hola.", "englishStrict": "Hel"}
+    assert closed
+
+
+def test_truncated_inside_nested_brackets():
+    value, closed = _repaired('{"a": {"b": [1, 2, {"c": "d"')
+    assert value == {"a": {"b": [1, 2, {"c": "d"}]}}
+    assert closed
+
+
+def test_truncated_after_trailing_escape():
+    value, closed = _repaired('{"originalStrict": "say \\"hi\\')
+    assert value == {"originalStrict": 'say "hi'}
+    assert closed
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '{"originalStrict": "Hola.", "englishStrict"',
+        '{"originalStrict": "Hola.", "englishStrict":',
+        '{"originalStrict": "Hola.", "englishStrict": ',
+        '{"originalStrict": "Hola.", "englishSt',
+    ],
+)
+def test_dangling_key_is_dropped(text):
+    value, closed = _repaired(text)
+    assert value == {"originalStrict": "Hola."}
+    assert closed
+
+
+def test_dangling_key_in_nested_object():
+    value, _ = _repaired('{"a": [{"b": 1}, {"c"')
+    assert value == {"a": [{"b": 1}, {}]}
+
+
+def test_fixes_control_characters_literals_and_trailing_commas():
+    value, closed = _repaired('{"a": "line\none", "b": None, "c": [True, False,],} trailing')
+    assert value == {"a": "line\none", "b": None, "c": [True, False]}
+    assert not closed
+
+
+def _request_with_response(monkeypatch, text):
+    async def fake_generate_content(contents, **kwargs):
+        return SimpleNamespace(text=text, candidates=[])
+
+    monkeypatch.setattr(transcription, "generate_content", fake_generate_content)
+    return asyncio.run(
+        transcription._request_strict_variants({"inline_data": {}}, "prompt", session_id="test")
+    )
+
+
+def test_repaired_response_missing_strict_field_raises(monkeypatch):
+    with pytest.raises(ValueError, match="englishStrict"):
+        _request_with_response(monkeypatch, '{"originalStrict": "Hola, this was cut')
+
+
+def test_repaired_response_reports_cut_off(monkeypatch):
+    variants, _, cut_off = _request_with_response(
+        monkeypatch,
+        '{"originalStrict": "Hola.", "englishStrict": "Hello.", "englishLight": "Hel',
+    )
+    assert variants["englishLight"] == "Hel"
+    assert cut_off